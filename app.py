@@ -1,22 +1,34 @@
 # app.py
+import hashlib
+import logging
 import os
+import threading
+import orjson
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from flask import Flask, jsonify, request, render_template
 from flask_cors import CORS
 from flask_jwt_extended import (
-    create_access_token, JWTManager, get_jwt_identity, jwt_required
+    create_access_token, JWTManager, get_jwt_identity
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 
 # --- NEW IMPORTS ---
 from db import db        # Import the db instance
 from models import User, CribbageGame  # Import your User model (and any other models)
+from auth import jwt_required_cached
+from json_provider import OrjsonProvider
+from schemas import ScoreIn
 from flask_migrate import Migrate
+from werkzeug.serving import make_ssl_devcert
+from pydantic import ValidationError
+from sqlalchemy import false, func, insert, not_, select, union_all
+from sqlalchemy.orm import aliased, load_only, undefer
 
 # Load environment variables from .env file
 load_dotenv()
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # --- JWT Configuration ---
 app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "a-default-secret-key-for-dev")
@@ -34,32 +46,105 @@ app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
 if not app.config["SQLALCHEMY_DATABASE_URI"]:
     raise ValueError("DATABASE_URL environment variable is not set! Please check your .env file or system environment.")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+# Keep warm connections so requests don't pay for a fresh connect; pre-ping and recycle
+# so idles dropped by Postgres are replaced quietly.
+# Every gunicorn worker gets its own pool, so split DB_MAX_CONNECTIONS (default 90: the
+# docker-compose Postgres allows max_connections=100, minus headroom for psql/migrations)
+# across GUNICORN_WORKERS so workers * (pool_size + max_overflow) stays under that limit.
+# gunicorn.conf.py exports GUNICORN_WORKERS; the single-process dev server counts as 1.
+db_connections_per_worker = max(
+    int(os.environ.get("DB_MAX_CONNECTIONS", 90)) // int(os.environ.get("GUNICORN_WORKERS", 1)), 2
+)
+# DB_POOL_SIZE / DB_MAX_OVERFLOW can tune the split, but are capped to the per-worker budget
+# (a negative max_overflow breaks QueuePool instead of making it wait)
+db_pool_size = min(int(os.environ.get("DB_POOL_SIZE", db_connections_per_worker // 2)), db_connections_per_worker)
+db_max_overflow = max(min(
+    int(os.environ.get("DB_MAX_OVERFLOW", db_connections_per_worker - db_pool_size)),
+    db_connections_per_worker - db_pool_size
+), 0)
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+    "pool_size": db_pool_size,
+    "max_overflow": db_max_overflow,
+    "pool_recycle": 3600,
+    "pool_pre_ping": True,
+}
 
 # --- Initialize SQLAlchemy with the app ---
 # This is the key step for segmentation: Associate the db instance with the Flask app
 db.init_app(app)
 migrate = Migrate(app, db)
 
+# --- User lookup cache ---
+# Protected endpoints resolve the JWT identity to a User on every request; the row
+# almost never changes, so keep recently seen users in process for a short while.
+# Cached instances are expunged from the session so later commits can't expire them.
+_user_cache = TTLCache(maxsize=5000, ttl=60)
+_user_cache_lock = threading.Lock()
+
+def load_user(user_id):
+    user_id = int(user_id)
+    with _user_cache_lock:
+        user = _user_cache.get(user_id)
+    if user is not None:
+        return user
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        db.session.expunge(user)
+        with _user_cache_lock:
+            _user_cache[user_id] = user
+    return user
+
+# --- Opponent list cache ---
+# Serialized /api/users bodies per requesting user. The list only changes when someone
+# registers, which bumps _users_version so fresh keys miss (other workers catch up on TTL).
+_opponent_list_cache = TTLCache(maxsize=64, ttl=30)
+_opponent_list_cache_lock = threading.Lock()
+_users_version = 0
+
+def invalidate_user_list():
+    global _users_version
+    with _opponent_list_cache_lock:
+        _users_version += 1
+
 
 # --- All your endpoints (login, register, get_data, get_post_data) ---
 # These remain mostly the same, but now they use the User model imported from models.py
 
+# Rendered landing pages, keyed by _users_version like the opponent list cache
+_index_page_cache = TTLCache(maxsize=4, ttl=300)
+_index_page_cache_lock = threading.Lock()
+INDEX_USERS_LIMIT = 100
+
 @app.route("/")
 def index():
-    users = User.query.all()
-  
-    return render_template('index.html', users=users)
+    cache_key = _users_version
+    with _index_page_cache_lock:
+        page = _index_page_cache.get(cache_key)
+
+    if page is None:
+        users = User.query.options(load_only(User.id, User.username)).order_by(User.id).limit(INDEX_USERS_LIMIT).all()
+        page = render_template('index.html', users=users)
+        with _index_page_cache_lock:
+            _index_page_cache[cache_key] = page
+
+    return page
 
 @app.post("/api/login")
 def login():
     username = request.json.get('username', None)
     password = request.json.get('password', None)
 
-    user = User.query.filter_by(username=username).first() # User comes from models.py
+    user = User.query.options(undefer(User.password_hash)).filter_by(username=username).first() # User comes from models.py
 
-    if not user or not user.check_password(password):
+    if not user or not password or not user.check_password(password):
         return jsonify({"msg": "Bad username or password"}), 401
 
+    # Upgrade legacy PBKDF2 hashes to bcrypt now that we have the plaintext
+    if user.password_needs_rehash:
+        user.set_password(password)
+        db.session.commit()
+
     access_token = create_access_token(identity=str(user.id))
     return jsonify({"msg": "Login successful", "access_token": access_token}), 200
 
@@ -75,12 +160,13 @@ def register():
     if User.query.filter_by(username=username).first():
         return jsonify({"msg": "Username already exists"}), 409
 
-    hashed_password = generate_password_hash(password)
-    new_user = User(username=username, password_hash=hashed_password)
+    new_user = User(username=username)
+    new_user.set_password(password)
 
     try:
         db.session.add(new_user)
         db.session.commit()
+        invalidate_user_list()
         return jsonify({"msg": "User created successfully"}), 201
     except Exception as e:
         db.session.rollback()
@@ -90,10 +176,10 @@ def register():
 
 # --- Protected GET Endpoint ---
 @app.get("/api/data")
-@jwt_required()
+@jwt_required_cached
 def get_data():
     current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id) # User comes from models.py
+    user = load_user(current_user_id) # User comes from models.py
     if not user:
         return jsonify({"msg": "User not found"}), 404
     return jsonify({"message": f"Hello, {user.username}! Your ID is {current_user_id}"})
@@ -101,94 +187,96 @@ def get_data():
 
 # --- Protected POST Endpoint ---
 @app.post("/api/data")
-@jwt_required()
+@jwt_required_cached
 def get_post_data():
-   print("post request received")
    current_user_id = get_jwt_identity()
-   user = User.query.get(current_user_id) # User comes from models.py
+   user = load_user(current_user_id) # User comes from models.py
    if not user:
        return jsonify({"msg": "User not found"}), 404
 
    data_from_client = request.json
-   print(f"User {user.username} submitted data: {data_from_client}")
+   if app.logger.isEnabledFor(logging.DEBUG):
+       app.logger.debug(f"User {user.username} submitted data: {data_from_client}")
 
    return jsonify({"message": f"Data received from {user.username}", "data": data_from_client})
 
 
 @app.get("/api/users")
-@jwt_required() # Protect this route
+@jwt_required_cached # Protect this route
 def get_users_for_opponent_selection():
     current_user_id = get_jwt_identity() # Get the ID of the currently authenticated user
 
-    # Fetch all users EXCEPT the current logged-in user
-    # This ensures a user cannot select themselves as an opponent from the dropdown
-    users = User.query.filter(User.id != current_user_id).all()
-
-    # Return a list of user dictionaries using the to_dict method
-    # The frontend expects a direct array, not nested under "users" key
-    return jsonify([user.to_dict() for user in users]), 200
+    cache_key = (_users_version, current_user_id)
+    with _opponent_list_cache_lock:
+        cached = _opponent_list_cache.get(cache_key)
+
+    if cached is None:
+        # Fetch all users EXCEPT the current logged-in user
+        # This ensures a user cannot select themselves as an opponent from the dropdown
+        # Only id/username are selected so password hashes never leave the database
+        users = db.session.query(User.id, User.username).filter(User.id != current_user_id).all()
+
+        # Same shape as User.to_dict()
+        # The frontend expects a direct array, not nested under "users" key
+        body = orjson.dumps([{'id': user.id, 'username': user.username} for user in users])
+        cached = (body, hashlib.md5(body).hexdigest())
+        with _opponent_list_cache_lock:
+            _opponent_list_cache[cache_key] = cached
+
+    body, etag = cached
+    # A 304 must carry the same validators the 200 would have
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, status=200, mimetype='application/json')
+    response.set_etag(etag)
+    return response
 
 # --- Protected POST Endpoint for Logging Cribbage Scores ---
 @app.post("/api/score")
-@jwt_required() # Protect this route
+@jwt_required_cached # Protect this route
 def log_cribbage_score():
     try:
         current_user_id = get_jwt_identity() # Get the ID of the currently authenticated user from the JWT
-        data = request.get_json() # Get the JSON payload from the frontend
 
         # --- Server-Side Validation ---
-        required_fields = ['user_score', 'opponent_score', 'is_skunk', 'is_double_skunk']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
-
+        # Parse and validate the raw body in one pass
         try:
-            user_score = int(data['user_score'])
-            opponent_score = int(data['opponent_score'])
-            if not (0 <= user_score <= 121 and 0 <= opponent_score <= 121):
-                return jsonify({"error": "Scores must be between 0 and 121"}), 400
-        except (ValueError, TypeError):
-            return jsonify({"error": "Scores must be valid numbers"}), 400
-
-        opponent_user_id = data.get('opponent_user_id')
-        guest_opponent_name = data.get('guest_opponent_name')
-
-        # Ensure that either opponent_user_id OR guest_opponent_name is provided, but not both
-        if opponent_user_id is None and guest_opponent_name is None:
-            return jsonify({"error": "Either opponent_user_id or guest_opponent_name must be provided"}), 400
-        if opponent_user_id is not None and guest_opponent_name is not None:
-             # This case means both were sent. Prioritize opponent_user_id as it's for registered users.
-             guest_opponent_name = None # Clear guest name if registered user ID is present
-        elif opponent_user_id is not None:
+            payload = ScoreIn.model_validate_json(request.get_data(cache=False))
+        except ValidationError as e:
+            return jsonify({
+                "error": "Invalid score payload",
+                # include_input=False: malformed bodies put raw bytes in "input", which can't be
+                # serialized, and we don't want to echo the client's payload back anyway
+                "details": e.errors(include_url=False, include_context=False, include_input=False)
+            }), 400
+
+        if payload.opponent_user_id is not None:
             # Verify opponent_user_id refers to an actual existing user
-            if not User.query.get(opponent_user_id):
+            opponent_exists = db.session.query(
+                db.session.query(User.id).filter(User.id == payload.opponent_user_id).exists()
+            ).scalar()
+            if not opponent_exists:
                 return jsonify({"error": "Referenced opponent_user_id does not exist"}), 400
-        elif guest_opponent_name is not None and not isinstance(guest_opponent_name, str):
-            return jsonify({"error": "guest_opponent_name must be a string"}), 400
-
-
-        # Create a new CribbageGame instance
-        new_game = CribbageGame(
-            user_id=current_user_id, # <--- CRUCIAL: Use user ID from JWT, NOT from frontend payload
-            user_score=user_score,
-            opponent_score=opponent_score,
-            opponent_user_id=opponent_user_id,
-            guest_opponent_name=guest_opponent_name,
-            is_skunk=bool(data.get('is_skunk', False)),
-            is_double_skunk=bool(data.get('is_double_skunk', False)),
-            notes=data.get('notes') # 'notes' field is now in the model
-        )
-
-        db.session.add(new_game)
+
+        # Insert the game directly and only read back its id; nothing else
+        # needs a hydrated CribbageGame here
+        new_game_values = {
+            "user_id": int(current_user_id), # <--- CRUCIAL: Use user ID from JWT, NOT from frontend payload
+            **payload.model_dump()
+        }
+        new_game_id = db.session.execute(
+            insert(CribbageGame).values(**new_game_values).returning(CribbageGame.id)
+        ).scalar_one()
         db.session.commit()
 
         # Return a success response
         return jsonify({
             "message": "Cribbage game logged successfully!",
-            "game_id": new_game.id,
-            "user_id": new_game.user_id, # Can return this for confirmation
-            "user_score": new_game.user_score,
-            "opponent_score": new_game.opponent_score
+            "game_id": new_game_id,
+            "user_id": new_game_values["user_id"], # Can return this for confirmation
+            "user_score": new_game_values["user_score"],
+            "opponent_score": new_game_values["opponent_score"]
         }), 201 # 201 Created
 
     except Exception as e:
@@ -197,81 +285,105 @@ def log_cribbage_score():
         return jsonify({"error": "Internal server error", "details": str(e)}), 500
 
 
+# --- Win/loss SQL expressions ---
+# game is CribbageGame or an aliased() view of it. A user won if they reached 121 on their
+# side of the game, and lost if the other side did instead. opponent_user_id is NULL for
+# guest games, so coalesce to keep these strictly true/false
+def game_won_by(game, user_id):
+    return func.coalesce(
+        ((game.user_id == user_id) & (game.user_score == 121)) |
+        ((game.opponent_user_id == user_id) & (game.opponent_score == 121)),
+        false()
+    )
+
+def game_lost_by(game, user_id):
+    return func.coalesce(
+        ((game.user_id == user_id) & (game.opponent_score == 121)) |
+        ((game.opponent_user_id == user_id) & (game.user_score == 121)),
+        false()
+    )
+
+
 # --- Protected GET Endpoint for Dashboard Stats ---
 @app.get("/api/dashboard-stats")
-@jwt_required()
+@jwt_required_cached
 def get_dashboard_stats():
     current_user_id = get_jwt_identity() # Get the ID of the currently authenticated user
 
     # Fetch the current user object
-    current_user = User.query.get(current_user_id)
+    current_user = load_user(current_user_id)
     if not current_user:
         return jsonify({"error": "User not found"}), 404
 
-    # Get all games where the current user was either the recorder or the opponent
-    all_relevant_games = CribbageGame.query.filter(
-        (CribbageGame.user_id == current_user_id) |
-        (CribbageGame.opponent_user_id == current_user_id)
-    ).order_by(CribbageGame.game_date.desc()).all() # Order by date descending for streak calculation
-
-    total_games = len(all_relevant_games)
-    total_wins = 0
-    total_losses = 0
-    consecutive_wins = 0
-    
-    # Calculate wins, losses, and consecutive wins
-    for game in all_relevant_games:
-        print(game.user_id)
-        print(game.user_score)
-        print(game.opponent_score)
-        print(current_user_id)
-        print(current_user.id)
-        print(current_user.id == game.user_id)
-        print(current_user_id == game.user_id)
-        # Determine if the current_user_id won this specific game
-        current_user_won_this_game = False
-        if game.user_id == current_user.id and game.user_score == 121:
-            current_user_won_this_game = True
-        elif game.opponent_user_id == current_user.id and game.opponent_score == 121:
-            current_user_won_this_game = True
-
-        # Update total wins/losses
-        if current_user_won_this_game:
-            total_wins += 1
-        else:
-            # A game is a loss if the other player reached 121, or if the current user reached 121
-            # but the other player also reached 121 (unlikely in cribbage, but covers all cases)
-            if (game.user_id == current_user.id and game.opponent_score == 121) or \
-               (game.opponent_user_id == current_user.id and game.user_score == 121):
-                total_losses += 1
-
-        # Calculate consecutive wins (only if the game was a win for the current user)
-        if current_user_won_this_game:
-            consecutive_wins += 1
-        else:
-            # Streak is broken if the current game was not a win for the current user
-            # Since games are ordered by date descending, the first non-win breaks the streak
-            break
-
-    # Get recent games (e.g., last 10, or all if less than 10)
-    # Use the to_dict method, passing the current_user_id so it can calculate 'viewer_won'
+    # Every game where the current user was either the recorder or the opponent
+    is_relevant = (CribbageGame.user_id == current_user.id) | (CribbageGame.opponent_user_id == current_user.id)
+    user_won = game_won_by(CribbageGame, current_user.id)
+    user_lost = game_lost_by(CribbageGame, current_user.id)
+
+    # The current streak is every game played since the most recent game that wasn't a win.
+    # correlate(None): this scans cribbage_games on its own rather than the outer query's row
+    last_non_win_date = db.session.query(func.max(CribbageGame.game_date)) \
+        .filter(is_relevant, not_(user_won)).correlate(None).scalar_subquery()
+
+    # Let the database do the counting in a single pass instead of hydrating every game
+    totals = db.session.query(
+        func.count().label("total_games"),
+        func.count().filter(user_won).label("total_wins"),
+        func.count().filter(not_(user_won) & user_lost).label("total_losses"),
+        func.count().filter(
+            last_non_win_date.is_(None) | (CribbageGame.game_date > last_non_win_date)
+        ).label("consecutive_wins"),
+    ).filter(is_relevant).one()
+
+    # Get recent games (e.g., last 10, or all if less than 10), with both players'
+    # usernames joined in and handed straight to to_dict()
+    # Take the newest games from each side separately and merge them: each half is a
+    # range scan on its (player, game_date DESC) index instead of an OR + sort
     recent_games_limit = 10
-    recent_games_data = [game.to_dict(current_user_id=current_user.id) for game in all_relevant_games[:recent_games_limit]]
+    recorded_games = select(CribbageGame) \
+        .where(CribbageGame.user_id == current_user.id) \
+        .order_by(CribbageGame.game_date.desc()).limit(recent_games_limit)
+    opponent_games = select(CribbageGame) \
+        .where(CribbageGame.opponent_user_id == current_user.id, CribbageGame.user_id != current_user.id) \
+        .order_by(CribbageGame.game_date.desc()).limit(recent_games_limit)
+    recent_game = aliased(CribbageGame, union_all(recorded_games, opponent_games).subquery())
+
+    player = aliased(User)
+    opponent = aliased(User)
+    recent_rows = db.session.query(
+        recent_game, player.username, opponent.username,
+        game_won_by(recent_game, current_user.id).label("viewer_won")
+    ) \
+        .join(player, recent_game.user_id == player.id) \
+        .outerjoin(opponent, recent_game.opponent_user_id == opponent.id) \
+        .order_by(recent_game.game_date.desc()).limit(recent_games_limit).all()
+
+    # Usernames and viewer_won already came back from the database, so to_dict() doesn't
+    # touch relationships or recompute the winner
+    recent_games_data = [
+        game.to_dict(current_user_id=current_user.id, viewer_won=viewer_won,
+                     player_username=player_username, opponent_username=opponent_username)
+        for game, player_username, opponent_username, viewer_won in recent_rows
+    ]
 
     return jsonify({
         "username": current_user.username,
-        "total_games": total_games,
-        "total_wins": total_wins,
-        "total_losses": total_losses,
-        "consecutive_wins": consecutive_wins,
+        "total_games": totals.total_games,
+        "total_wins": totals.total_wins,
+        "total_losses": totals.total_losses,
+        "consecutive_wins": totals.consecutive_wins,
         "recent_games": recent_games_data
     }), 200
 
 
 
+# Constant body, encoded once. A fresh Response is still built per request because
+# after_request handlers (flask-cors) add headers to it
+_MESSAGE_BODY = orjson.dumps("message")
+
 @app.get("/api/message")
 def get_message():
-    return jsonify("message")
+    return app.response_class(_MESSAGE_BODY, mimetype='application/json')
 
 
 
@@ -279,8 +391,18 @@ def get_message():
 
 
 if __name__ == "__main__":
-    with app.app_context():
-        db.create_all() # This will create tables in your database
-    # app.run(debug=True, ssl_context=('cert.pem', 'key.pem')) # Adjust SSL context as needed
-    app.run(debug=True, ssl_context='adhoc')
+    # The schema is managed by Flask-Migrate; run `flask db upgrade` before starting
+    # Dev only: serve over TLS with a persistent self-signed cert, generated once on first
+    # run (dev.crt/dev.key, gitignored) instead of minting an adhoc one on every start.
+    # Point DEV_SSL_CERT_FILE/DEV_SSL_KEY_FILE at your own files (e.g. from mkcert) to use those.
+    # In production TLS (and HTTP/2) is terminated by the reverse proxy in front of gunicorn
+    cert_file = os.environ.get("DEV_SSL_CERT_FILE")
+    key_file = os.environ.get("DEV_SSL_KEY_FILE")
+    if not (cert_file and key_file):
+        cert_file, key_file = "dev.crt", "dev.key"
+        if not (os.path.exists(cert_file) and os.path.exists(key_file)):
+            app.logger.info(f"Generating a self-signed dev certificate in {cert_file}/{key_file}")
+            make_ssl_devcert("dev", host="localhost")
+    ssl_context = (cert_file, key_file)
+    app.run(debug=True, ssl_context=ssl_context)
 
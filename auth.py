@@ -0,0 +1,67 @@
+# auth.py
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from cachetools import TTLCache
+from flask import current_app, g, request
+from flask_jwt_extended import get_jwt, verify_jwt_in_request
+
+# --- Verified JWT cache ---
+# Maps sha256(raw token) -> (jwt_header, jwt_data) for tokens that already passed
+# signature verification, so repeated requests with the same token skip the crypto.
+# Entries never outlive the token itself: a hit is only honoured while exp is in the future.
+JWT_CACHE_TTL = 30
+_verified_jwt_cache = TTLCache(maxsize=10000, ttl=JWT_CACHE_TTL)
+_verified_jwt_cache_lock = threading.Lock()
+
+
+def _raw_token_from_header():
+    auth_header = request.headers.get(current_app.config.get("JWT_HEADER_NAME", "Authorization"))
+    if not auth_header:
+        return None
+    header_type = current_app.config.get("JWT_HEADER_TYPE", "Bearer")
+    parts = auth_header.split()
+    if header_type:
+        if len(parts) != 2 or parts[0] != header_type:
+            return None
+        return parts[1]
+    return parts[0] if len(parts) == 1 else None
+
+
+def jwt_required_cached(fn):
+    """Drop-in replacement for @jwt_required() that caches verified tokens."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _raw_token_from_header()
+        if token is None:
+            # Let flask_jwt_extended produce its usual "missing/invalid header" response
+            verify_jwt_in_request()
+            return current_app.ensure_sync(fn)(*args, **kwargs)
+
+        key = hashlib.sha256(token.encode()).digest()
+        with _verified_jwt_cache_lock:
+            cached = _verified_jwt_cache.get(key)
+
+        if cached is not None and cached[1]["exp"] > time.time():
+            jwt_header, jwt_data = cached
+            # Populate the same request context flask_jwt_extended would, so
+            # get_jwt() / get_jwt_identity() keep working inside the view.
+            # NOTE: these are flask_jwt_extended's private g attributes as set by
+            # verify_jwt_in_request() in 4.x (pinned to 4.7.1 in requirements.txt);
+            # re-check them, and tests/test_auth.py, when upgrading
+            g._jwt_extended_jwt_user = None
+            g._jwt_extended_jwt_header = jwt_header
+            g._jwt_extended_jwt = jwt_data
+            g._jwt_extended_jwt_location = "headers"
+        else:
+            verify_jwt_in_request()
+            jwt_data = get_jwt()
+            if "exp" in jwt_data:
+                with _verified_jwt_cache_lock:
+                    _verified_jwt_cache[key] = (g._jwt_extended_jwt_header, jwt_data)
+
+        return current_app.ensure_sync(fn)(*args, **kwargs)
+
+    return wrapper
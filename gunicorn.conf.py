@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+# Loaded automatically by gunicorn when run from the project root.
+import multiprocessing
+import os
+
+# Plain HTTP: TLS, HTTP/2 and OCSP stapling are handled by the fronting proxy (nginx/traefik)
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# The app spends almost all of its time waiting on Postgres, so use gevent
+# workers and let each one juggle many requests at once.
+worker_class = "gevent"
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+
+def post_fork(server, worker):
+    # app.py divides its DB connection budget by this. Exported from the worker itself so
+    # it reflects the count gunicorn actually runs (including a CLI -w override); the app is
+    # loaded after this hook, so don't enable preload_app
+    os.environ["GUNICORN_WORKERS"] = str(server.cfg.workers)
@@ -0,0 +1,30 @@
+# json_provider.py
+import json
+
+import orjson
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider that encodes jsonify() responses with orjson."""
+
+    # Sorted keys like Flask's default provider. Dates/datetimes are passed through to
+    # Flask's own fallback so they still come out as HTTP dates rather than orjson's ISO
+    # strings; the fallback also covers Decimal, objects with __html__, ...
+    option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    default = staticmethod(DefaultJSONProvider.default)
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+    def loads(self, s, **kwargs):
+        # Parsing stays on the stdlib: orjson turns integers wider than 64 bits into
+        # floats, which would silently change client payloads
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Skip the bytes -> str -> bytes round trip dumps() would need
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self.option | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
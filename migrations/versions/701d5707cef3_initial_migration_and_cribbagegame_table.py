@@ -1,9 +1,17 @@
-"""Initial migration and CribbageGame table
+"""Initial migration: users and CribbageGame tables
 
 Revision ID: 701d5707cef3
 Revises: 
 Create Date: 2025-07-02 12:35:18.691754
 
+The users table was added to this revision after the fact, once the app stopped calling
+db.create_all() at startup. A database that was built by create_all() and has no
+alembic_version row already has both tables, so mark it as being at this revision
+instead of running it:
+
+    flask db stamp 701d5707cef3
+    flask db upgrade
+
 """
 from alembic import op
 import sqlalchemy as sa
@@ -18,6 +26,15 @@ depends_on = None
 
 def upgrade():
     # ### commands auto generated by Alembic - please adjust! ###
+    # users was originally created by db.create_all() at startup; create it here so
+    # a fresh database can be built from migrations alone
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('username')
+    )
     op.create_table('cribbage_games',
     sa.Column('id', sa.Integer(), nullable=False),
     sa.Column('user_id', sa.Integer(), nullable=False),
@@ -38,4 +55,5 @@ def upgrade():
 def downgrade():
     # ### commands auto generated by Alembic - please adjust! ###
     op.drop_table('cribbage_games')
+    op.drop_table('users')
     # ### end Alembic commands ###
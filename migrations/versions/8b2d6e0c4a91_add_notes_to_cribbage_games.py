@@ -0,0 +1,30 @@
+"""add notes to cribbage_games
+
+Revision ID: 8b2d6e0c4a91
+Revises: 3c9e4f1a7b2d
+Create Date: 2026-10-15 11:03:27.194402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d6e0c4a91'
+down_revision = '3c9e4f1a7b2d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # notes was added to the model after the initial migration and, until now, only
+    # reached the database through db.create_all(); skip it where that already happened
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('cribbage_games')}
+    if 'notes' not in columns:
+        with op.batch_alter_table('cribbage_games', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('notes', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('cribbage_games', schema=None) as batch_op:
+        batch_op.drop_column('notes')
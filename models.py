@@ -1,20 +1,76 @@
 # models.py
+import base64
+import hashlib
+import threading
 from datetime import datetime
+
+import bcrypt
+from cachetools import TTLCache
+from gevent import get_hub, monkey
 from db import db # Import the db instance from your new db.py file
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+
+# bcrypt work factor (2^rounds iterations); 10 keeps login well under 100ms
+BCRYPT_ROUNDS = 10
+
+# Recently verified (user, password) pairs, so repeated logins skip the hash.
+# Keys include the stored hash, so changing a password invalidates its entries.
+_verified_password_cache = TTLCache(maxsize=5000, ttl=60)
+_verified_password_cache_lock = threading.Lock()
+
+def _run_off_hub(fn, *args):
+    """Run a CPU-heavy call (password hashing) without stalling the gevent hub.
+
+    Under gunicorn's gevent workers, hand it to gevent's native threadpool: bcrypt and
+    hashlib release the GIL, so other greenlets keep running meanwhile. threading and
+    concurrent.futures are monkey-patched into greenlets there, so they wouldn't help.
+    Without gevent (the dev server) just call it.
+    """
+    if monkey.is_module_patched('threading'):
+        return get_hub().threadpool.apply(fn, args)
+    return fn(*args)
+
+def _bcrypt_input(password):
+    # bcrypt silently ignores everything past 72 bytes, so feed it a fixed-length digest
+    # of the whole password instead (base64 keeps NUL bytes out of it)
+    return base64.b64encode(hashlib.sha256(password.encode()).digest())
 
 # Define your User model
 class User(db.Model):
     __tablename__ = 'users' # Good practice to explicitly set table name
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(255), nullable=False)
+    # Deferred: only login needs the hash, so other queries don't pull it in (see undefer in app.login)
+    password_hash = db.deferred(db.Column(db.String(255), nullable=False))
 
     def __repr__(self):
         return f'<User {self.username}>'
 
+    def set_password(self, password):
+        self.password_hash = _run_off_hub(
+            bcrypt.hashpw, _bcrypt_input(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
+        ).decode()
+
+    @property
+    def password_needs_rehash(self):
+        # Accounts registered before the switch to bcrypt still carry Werkzeug PBKDF2 hashes
+        return not self.password_hash.startswith('$2')
+
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        cache_key = hashlib.sha256(f'{self.id}:{self.password_hash}:{password}'.encode()).digest()
+        with _verified_password_cache_lock:
+            if cache_key in _verified_password_cache:
+                return True
+
+        if self.password_needs_rehash:
+            is_valid = _run_off_hub(check_password_hash, self.password_hash, password)
+        else:
+            is_valid = _run_off_hub(bcrypt.checkpw, _bcrypt_input(password), self.password_hash.encode())
+
+        if is_valid:
+            with _verified_password_cache_lock:
+                _verified_password_cache[cache_key] = True
+        return is_valid
     
     def to_dict(self):
         return {
@@ -39,6 +95,11 @@ class CribbageGame(db.Model):
     Model to store the final scores of Cribbage games.
     """
     __tablename__ = 'cribbage_games' # Explicitly set table name
+    # Dashboard lookups filter on either player and want the newest games first
+    __table_args__ = (
+        db.Index('ix_games_user_date', 'user_id', db.text('game_date DESC')),
+        db.Index('ix_games_opp_date', 'opponent_user_id', db.text('game_date DESC')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
@@ -118,28 +179,38 @@ class CribbageGame(db.Model):
         """Basic validation for cribbage scores (must reach 121)."""
         return self.user_score == 121 or self.opponent_score == 121
     
-    def to_dict(self, current_user_id=None): # Added current_user_id for context
+    def to_dict(self, current_user_id=None, viewer_won=None,
+                player_username=None, opponent_username=None): # Added current_user_id for context
+        # Callers that already selected the usernames (e.g. joined in SQL) pass them in so
+        # serializing many games doesn't touch the player relationships row by row;
+        # opponent_username is None for guest games
+        if player_username is None:
+            player_username = self.player_user.username if self.player_user else None
+            opponent_username = self.opponent_registered_user.username if self.opponent_registered_user else None
+
         # Determine opponent's display name for serialization
         opponent_display_name = ""
-        if self.opponent_registered_user:
-            opponent_display_name = self.opponent_registered_user.username
+        if opponent_username:
+            opponent_display_name = opponent_username
         elif self.guest_opponent_name:
             opponent_display_name = self.guest_opponent_name
         else:
             opponent_display_name = "Unknown Opponent"
 
-        # Determine if the current viewer won this specific game
-        viewer_won = False
-        if current_user_id is not None:
-            if self.user_id == current_user_id and self.user_score == 121:
-                viewer_won = True
-            elif self.opponent_user_id == current_user_id and self.opponent_score == 121:
-                viewer_won = True
+        # Determine if the current viewer won this specific game, unless the caller
+        # already computed it (e.g. in SQL)
+        if viewer_won is None:
+            viewer_won = False
+            if current_user_id is not None:
+                if self.user_id == current_user_id and self.user_score == 121:
+                    viewer_won = True
+                elif self.opponent_user_id == current_user_id and self.opponent_score == 121:
+                    viewer_won = True
 
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'user_username': self.player_user.username if self.player_user else None,
+            'user_username': player_username,
             'user_score': self.user_score,
             'opponent_user_id': self.opponent_user_id,
             'opponent_username': opponent_display_name,
@@ -0,0 +1,28 @@
+# schemas.py
+from typing import Annotated, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# A cribbage game ends when someone pegs out at 121
+Score = Annotated[int, Field(ge=0, le=121)]
+
+
+class ScoreIn(BaseModel):
+    """Payload for POST /api/score."""
+    user_score: Score
+    opponent_score: Score
+    is_skunk: bool
+    is_double_skunk: bool
+    opponent_user_id: Optional[int] = None
+    guest_opponent_name: Optional[str] = None
+    notes: Optional[str] = None
+
+    @model_validator(mode='after')
+    def check_opponent(self):
+        # Ensure that either opponent_user_id OR guest_opponent_name is provided
+        if self.opponent_user_id is None and self.guest_opponent_name is None:
+            raise ValueError("Either opponent_user_id or guest_opponent_name must be provided")
+        # If both were sent, prioritize opponent_user_id as it's for registered users
+        if self.opponent_user_id is not None:
+            self.guest_opponent_name = None
+        return self
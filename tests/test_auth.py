@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import pytest
+from flask import Flask, jsonify
+from flask_jwt_extended import JWTManager, create_access_token, decode_token, get_jwt_identity
+
+import auth
+from auth import jwt_required_cached
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret"
+    app.config["JWT_TOKEN_LOCATION"] = ["headers"]
+    JWTManager(app)
+
+    @app.get("/protected")
+    @jwt_required_cached
+    def protected():
+        return jsonify({"identity": get_jwt_identity()})
+
+    auth._verified_jwt_cache.clear()
+    yield app
+    auth._verified_jwt_cache.clear()
+
+
+def make_token(app, **kwargs):
+    with app.app_context():
+        return create_access_token(identity="42", **kwargs)
+
+
+def get_protected(app, token):
+    return app.test_client().get("/protected", headers={"Authorization": f"Bearer {token}"})
+
+
+def test_cached_token_skips_verification(app, monkeypatch):
+    token = make_token(app)
+    assert get_protected(app, token).status_code == 200
+    assert len(auth._verified_jwt_cache) == 1
+
+    def fail_verification(*args, **kwargs):
+        raise AssertionError("cached token was verified again")
+
+    monkeypatch.setattr(auth, "verify_jwt_in_request", fail_verification)
+
+    response = get_protected(app, token)
+    assert response.status_code == 200
+    assert response.get_json() == {"identity": "42"}
+
+
+def test_expired_token_is_refused_even_if_cached(app):
+    token = make_token(app, expires_delta=timedelta(seconds=-1))
+    with app.app_context():
+        jwt_data = decode_token(token, allow_expired=True)
+        jwt_header = {"alg": app.config.get("JWT_ALGORITHM", "HS256"), "typ": "JWT"}
+    # Simulate an entry that was cached while the token was still valid
+    auth._verified_jwt_cache[auth.hashlib.sha256(token.encode()).digest()] = (jwt_header, jwt_data)
+
+    assert get_protected(app, token).status_code == 401
+
+
+def test_bad_signature_is_rejected_and_not_cached(app):
+    other_app = Flask(__name__)
+    other_app.config["JWT_SECRET_KEY"] = "some-other-secret"
+    JWTManager(other_app)
+    token = make_token(other_app)
+
+    assert get_protected(app, token).status_code == 422
+    assert len(auth._verified_jwt_cache) == 0
@@ -0,0 +1,36 @@
+import os
+import tempfile
+
+import pytest
+
+# app.py refuses to start without DATABASE_URL; these tests never reach the database
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.gettempdir(), "cribbage_test.db"))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from app import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    app.config["TESTING"] = True
+    with app.app_context():
+        token = create_access_token(identity="1")
+    with app.test_client() as client:
+        client.environ_base["HTTP_AUTHORIZATION"] = f"Bearer {token}"
+        yield client
+
+
+@pytest.mark.parametrize("body", [b"", b"{bad", b"null", b"[]"])
+def test_invalid_score_payload_is_rejected(client, body):
+    response = client.post("/api/score", data=body, content_type="application/json")
+
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid score payload"
+
+
+def test_invalid_score_payload_does_not_echo_input(client):
+    response = client.post("/api/score", data=b'{"user_score": 500}', content_type="application/json")
+
+    assert response.status_code == 400
+    assert all("input" not in error for error in response.get_json()["details"])
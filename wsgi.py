@@ -0,0 +1,13 @@
+# wsgi.py
+# Production entry point: gunicorn wsgi:app (settings are picked up from gunicorn.conf.py)
+
+# --- Cooperative I/O ---
+# Must run before anything else imports socket/ssl/psycopg2 so that blocking
+# DB and network calls yield to other greenlets instead of stalling the worker.
+from gevent import monkey
+monkey.patch_all()
+
+from psycogreen.gevent import patch_psycopg
+patch_psycopg()
+
+from app import app  # noqa: E402